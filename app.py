@@ -23,17 +23,22 @@ st.set_page_config(page_title="🎙️ Podcast Note-Taker", layout="wide")
 def init_state():
     if "marks" not in st.session_state:
         st.session_state.marks = []          # list of (timestamp, label)
-    if "play_start" not in st.session_state:
-        st.session_state.play_start = None   # wall-clock when user hit Play
+    if "play_start_ns" not in st.session_state:
+        st.session_state.play_start_ns = None  # monotonic clock when user hit Play
 
 def fake_current_time():
     """Mock the 'current playback position'."""
-    if st.session_state.play_start is None:
+    if st.session_state.play_start_ns is None:
         return 0
-    return int(time.time() - st.session_state.play_start)
+    return (time.monotonic_ns() - st.session_state.play_start_ns) // 1_000_000_000
 
 def hms(sec: int) -> str:
-    return str(timedelta(seconds=sec))
+    """``H:MM:SS`` – int fast path; floats and values outside 0–24 h use ``timedelta``."""
+    if type(sec) is not int or not 0 <= sec < 86_400:
+        return str(timedelta(seconds=sec))
+    h, rem = divmod(sec, 3600)
+    m, s = divmod(rem, 60)
+    return f"{h}:{m:02d}:{s:02d}"
 
 # ---------- UI ----------
 init_state()
@@ -54,21 +59,22 @@ if demo_clip:
 if audio_file:
     audio_bytes = audio_file.read()
     st.audio(audio_bytes, format="audio/mp3")
+    position = fake_current_time()  # clock at click time, for the Mark handler
 
     col1, col2, col3 = st.columns(3)
     with col1:
         if st.button("▶️ Play (mock)"):
-            st.session_state.play_start = time.time()      # store wall clock
+            st.session_state.play_start_ns = time.monotonic_ns()  # immune to NTP jumps
     with col2:
         if st.button("⏸️ Stop"):
-            st.session_state.play_start = None
+            st.session_state.play_start_ns = None
     with col3:
         if st.button("🔖 Mark this moment"):
-            ts = fake_current_time()
+            ts = position
             st.session_state.marks.append((ts, f"Moment {len(st.session_state.marks)+1}"))
 
     # Display running clock (mock)
-    st.write(f"Current position: **{hms(fake_current_time())}**")
+    st.write(f"Current position: **{hms(fake_current_time())}**")  # after Play/Stop handlers
 
 # 3. Show saved key moments -------------------------------------------------
 if st.session_state.marks:
@@ -15,20 +15,24 @@ The code is still an MVP – replace the stubs with real Whisper/LLM calls when
 
 from __future__ import annotations
 
+import bisect
+import gc
 import hashlib
-import io
 import os
 import sqlite3
+import tempfile
+import threading
 import time
+from collections import OrderedDict
 from contextlib import closing
 from datetime import timedelta
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
 
+import numpy as np
 import streamlit as st
 
-# Optional: Whisper, LLM imports
-# from whisper import load_model
+# Optional: LLM imports
 # import llama_cpp
 
 ###############################################################################
@@ -40,10 +44,56 @@ try:
 except ModuleNotFoundError:
     PLAYER_AVAILABLE = False
 
+try:
+    from blake3 import blake3 as _file_hasher  # type: ignore
+    _HASH_TAG = "b3"
+except ModuleNotFoundError:
+    _file_hasher = hashlib.sha256  # SHA‑NI accelerated on modern CPUs
+    _HASH_TAG = "s256"
+
+try:
+    import ctranslate2  # type: ignore
+    from faster_whisper import BatchedInferencePipeline, WhisperModel, decode_audio  # type: ignore
+    FASTER_WHISPER_AVAILABLE = True
+except ImportError:  # also faster‑whisper < 1.1 (no BatchedInferencePipeline)
+    FASTER_WHISPER_AVAILABLE = False
+
+try:
+    from pywhispercpp.model import Model as WhisperCppModel  # type: ignore
+    WHISPERCPP_AVAILABLE = True
+except ModuleNotFoundError:
+    WHISPERCPP_AVAILABLE = False
+
+try:
+    import librosa  # type: ignore
+    LIBROSA_AVAILABLE = True
+except ModuleNotFoundError:
+    LIBROSA_AVAILABLE = False
+
+try:
+    from silero_vad import get_speech_timestamps, load_silero_vad  # type: ignore
+    VAD_AVAILABLE = True
+except ImportError:  # also silero‑vad releases without the packaged helpers
+    VAD_AVAILABLE = False
+
+DECODER_AVAILABLE = LIBROSA_AVAILABLE or FASTER_WHISPER_AVAILABLE  # faster‑whisper ships PyAV
+
 ###############################################################################
 # ------------------------- CONFIG & CSS -------------------------------------
 ###############################################################################
 DB_PATH = Path("podcast_cache.db")
+AUDIO_DIR = Path(tempfile.gettempdir()) / "podcast_audio"  # uploads + decoded PCM, by file_id
+AUDIO_DIR_MAX_BYTES = 4 << 30    # on‑disk uploads + PCM; least‑recently used pruned past this
+AUDIO_STORE_MAX_BYTES = 2 << 30  # 2 GiB of in‑memory uploads shared by all sessions
+HASH_CHUNK = 1 << 20  # 1 MiB slices – lets the hasher release the GIL between updates
+CHUNK_SECONDS = 30          # Whisper's native window
+SAMPLE_RATE = 16_000        # Whisper input: 16 kHz mono (stored int16, fed float32)
+BATCH_SIZE = int(os.environ.get("WHISPER_BATCH_SIZE", "16"))  # consumer GPU 8–16, A100 32–64
+WHISPER_MODEL = os.environ.get("WHISPER_MODEL", "base.en")             # faster‑whisper size
+WHISPERCPP_MODEL = os.environ.get("WHISPERCPP_MODEL", "base.en-q5_1")  # GGML 5‑bit quantized weights
+
+# Fewer gen‑0 collections: each rerun allocates lots of short‑lived widgets/state
+gc.set_threshold(50_000, 100, 100)
 
 st.set_page_config(
     page_title="🎙️ Podcast Note‑Taker",
@@ -63,10 +113,23 @@ st.markdown(_MOBILE_CSS, unsafe_allow_html=True)
 # ------------------------- HELPERS ------------------------------------------
 ###############################################################################
 
+_SQL_GET = "SELECT transcript, summary FROM cache WHERE id=?"
+_SQL_SAVE = "REPLACE INTO cache(id,transcript,summary) VALUES (?,?,?)"
+
+
 @st.cache_resource(show_spinner=False)
 def get_db():
-    """Reuse a single SQLite connection across reruns."""
-    conn = sqlite3.connect(DB_PATH)
+    """Reuse a single SQLite connection across reruns.
+
+    Autocommit + WAL with ``synchronous=NORMAL``: a write is one atomic
+    statement and does not fsync on commit – fine for a rebuildable cache.
+    """
+    conn = sqlite3.connect(DB_PATH, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")  # 256 MiB
     conn.execute(
         """CREATE TABLE IF NOT EXISTS cache(
                id TEXT PRIMARY KEY,
@@ -76,35 +139,255 @@ def get_db():
     )
     return conn
 
-def hms(sec: float|int) -> str:
-    return str(timedelta(seconds=int(sec)))
+def hms(sec: int) -> str:
+    """``H:MM:SS`` – int fast path; floats and values outside 0–24 h use ``timedelta``."""
+    if type(sec) is not int or not 0 <= sec < 86_400:
+        return str(timedelta(seconds=sec))
+    h, rem = divmod(sec, 3600)
+    m, s = divmod(rem, 60)
+    return f"{h}:{m:02d}:{s:02d}"
 
 
-def file_md5(data: bytes|str) -> str:
+def file_md5(data: bytes|memoryview|str) -> str:
+    """Fingerprint a URL or audio blob (BLAKE3, falling back to SHA‑256).
+
+    The id carries the algorithm (``b3-…`` / ``s256-…``) so environments with
+    and without blake3 never mix keys in a shared cache.
+    """
     if isinstance(data, str):
-        data = data.encode()
-    return hashlib.md5(data).hexdigest()
+        return f"{_HASH_TAG}-{_file_hasher(data.encode()).hexdigest()}"
+    view = memoryview(data)
+    hasher = _file_hasher()
+    for start in range(0, len(view), HASH_CHUNK):
+        hasher.update(view[start:start + HASH_CHUNK])
+    return f"{_HASH_TAG}-{hasher.hexdigest()}"
+
+
+def _write_atomic(path: Path, write: Callable[[BinaryIO], None]) -> None:
+    """Write through a per‑writer ``.part`` file + ``os.replace``.
+
+    Readers never see a partial file, and an interrupted write (e.g. ENOSPC)
+    leaves nothing behind under the final, content‑addressed name.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.part")
+    try:
+        with tmp.open("wb") as fh:
+            write(fh)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def _prune_audio_dir(keep: Path) -> None:
+    """Delete least‑recently used files (by mtime) until AUDIO_DIR fits its cap."""
+    files = []
+    for f in AUDIO_DIR.iterdir():
+        if f == keep or f.name.endswith(".part"):
+            continue
+        try:
+            info = f.stat()
+        except FileNotFoundError:
+            continue
+        files.append((info.st_mtime, info.st_size, f))
+    total = keep.stat().st_size + sum(size for _, size, _ in files)
+    for _, size, f in sorted(files):
+        if total <= AUDIO_DIR_MAX_BYTES:
+            break
+        f.unlink(missing_ok=True)
+        total -= size
+
+
+def _touch(path: Path) -> bool:
+    """Bump *path*'s mtime (LRU order for pruning); False if it does not exist."""
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def persist_audio(file_id: str, data: bytes|memoryview, suffix: str = ".mp3") -> Path:
+    """Write an upload to disk once; the player then loads it by path."""
+    path = AUDIO_DIR / f"{file_id}{suffix}"
+    if not _touch(path):
+        _write_atomic(path, lambda fh: fh.write(data))
+        _prune_audio_dir(keep=path)
+    return path
+
+
+@st.cache_resource(show_spinner=False)
+def _audio_store() -> "OrderedDict[str, bytes]":
+    """Process‑wide ``file_id → bytes`` LRU; session state only keeps the id."""
+    return OrderedDict()
+
+
+@st.cache_resource(show_spinner=False)
+def _audio_store_lock() -> threading.Lock:
+    return threading.Lock()
+
+
+def load_audio(file_id: str, path: Path) -> bytes:
+    """Read a persisted upload once per process, evicting least‑recently used past the cap.
+
+    Every rerun hands ``st.audio`` the same object – no re‑read of the file.
+    """
+    store = _audio_store()
+    with _audio_store_lock():
+        if file_id in store:
+            store.move_to_end(file_id)
+        else:
+            store[file_id] = path.read_bytes()
+            total = sum(len(b) for b in store.values())
+            while total > AUDIO_STORE_MAX_BYTES and len(store) > 1:
+                _, evicted = store.popitem(last=False)
+                total -= len(evicted)
+        return store[file_id]
 
 
 def cache_get(id_: str) -> Optional[Tuple[str,str]]:
-    cur = get_db().execute("SELECT transcript, summary FROM cache WHERE id=?", (id_,))
-    row = cur.fetchone()
-    return (row[0], row[1]) if row else None
+    row = get_db().execute(_SQL_GET, (id_,)).fetchone()
+    return (row["transcript"], row["summary"]) if row else None
 
 
 def cache_save(id_: str, transcript: str, summary: str) -> None:
-    get_db().execute("REPLACE INTO cache(id,transcript,summary) VALUES (?,?,?)", (id_, transcript, summary))
-    get_db().commit()
+    get_db().execute(_SQL_SAVE, (id_, transcript, summary))
 
 ###############################################################################
 # ------------------------- HEAVYWORK (STUBS) --------------------------------
 ###############################################################################
 
-def transcribe_audio(data: bytes) -> str:
-    time.sleep(1)  # simulate latency
-    return "[Transcript would go here …]"
+def decode_pcm(file_id: str, audio_path: Path) -> np.ndarray:
+    """Decode to 16 kHz mono once and keep it as int16 ``.npy``.
+
+    Later calls memory‑map the file and only convert to Whisper's float32.
+    """
+    path = AUDIO_DIR / f"{file_id}.npy"
+    if not _touch(path):
+        if LIBROSA_AVAILABLE:
+            pcm, _sr = librosa.load(audio_path, sr=SAMPLE_RATE, mono=True)
+        else:
+            pcm = decode_audio(str(audio_path), sampling_rate=SAMPLE_RATE)
+        pcm16 = (np.clip(pcm, -1.0, 1.0) * 32767).astype(np.int16)  # half the disk of float32
+        _write_atomic(path, lambda fh: np.save(fh, pcm16))
+        _prune_audio_dir(keep=path)
+    pcm = np.load(path, mmap_mode="r").astype(np.float32)
+    pcm *= 1 / 32768
+    return pcm
+
+
+@st.cache_resource(show_spinner=False)
+def get_vad_model():
+    """Silero VAD on ONNX Runtime (CPU) – loaded once per process."""
+    return load_silero_vad(onnx=True)
+
+
+@st.cache_resource(show_spinner=False)
+def _vad_lock() -> threading.Lock:
+    """The VAD wrapper keeps recurrent state between frames – one scan at a time."""
+    return threading.Lock()
+
+
+def split_chunks(pcm: np.ndarray) -> List[Tuple[float, np.ndarray]]:
+    """Split PCM into ``(start_sec, chunk)`` pairs (views, no copies).
+
+    With Silero VAD, speech segments (each capped at CHUNK_SECONDS) are packed
+    into windows of at most CHUNK_SECONDS. Silence between windows is dropped
+    (avoids hallucinations on silence); pauses inside a window are kept so
+    chunks stay views. Without VAD, fixed windows.
+    """
+    step = CHUNK_SECONDS * SAMPLE_RATE
+    if not VAD_AVAILABLE:
+        return [(start / SAMPLE_RATE, pcm[start:start + step]) for start in range(0, len(pcm), step)]
+    with _vad_lock():
+        speech = get_speech_timestamps(
+            pcm, get_vad_model(), sampling_rate=SAMPLE_RATE, max_speech_duration_s=CHUNK_SECONDS
+        )
+    spans: List[Tuple[int, int]] = []
+    for seg in speech:  # sample offsets, ascending
+        if spans and seg["end"] - spans[-1][0] <= step:
+            spans[-1] = (spans[-1][0], seg["end"])
+        else:
+            spans.append((seg["start"], seg["end"]))
+    return [(start / SAMPLE_RATE, pcm[start:end]) for start, end in spans]
+
+
+@st.cache_resource(show_spinner="Loading Whisper…")
+def get_whisper_model(size: str = WHISPER_MODEL):
+    """Load Whisper once per process, never per rerun.
+
+    Prefers faster‑whisper, then whisper.cpp; None → stub transcription.
+    """
+    if FASTER_WHISPER_AVAILABLE:
+        if ctranslate2.get_cuda_device_count() > 0:
+            return WhisperModel(size, device="cuda", compute_type="int8_float16")
+        return WhisperModel(size, device="cpu", compute_type="int8")
+    if not WHISPERCPP_AVAILABLE:
+        return None
+    return WhisperCppModel(
+        WHISPERCPP_MODEL,
+        n_threads=os.cpu_count(),
+        print_progress=False,
+        print_realtime=False,
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def _model_lock() -> threading.Lock:
+    """One transcribe per model instance at a time.
+
+    Concurrent inference on a shared model produces inconsistent output.
+    """
+    return threading.Lock()
+
+
+def _transcribe_one(model, chunk: Tuple[float, np.ndarray]) -> str:
+    _start, pcm = chunk
+    with _model_lock():
+        # Timestamp decoding stays on: `no_timestamps` is not a parameter we can
+        # rely on across pywhispercpp releases, and the chunk start already
+        # comes from split_chunks.
+        segments = model.transcribe(np.asarray(pcm), language="en")
+    return " ".join(seg.text.strip() for seg in segments)
 
 
+@st.cache_resource(show_spinner=False)
+def _batched_pipeline(size: str = WHISPER_MODEL) -> "BatchedInferencePipeline":
+    """Keyed by *size*, so it always wraps the matching get_whisper_model(size)."""
+    return BatchedInferencePipeline(model=get_whisper_model(size))
+
+
+def _transcribe_batched(pcm: np.ndarray, size: str = WHISPER_MODEL) -> Iterator[str]:
+    """faster‑whisper: VAD‑split the whole file and push BATCH_SIZE windows per encoder pass."""
+    pipeline = _batched_pipeline(size)
+    with _model_lock():
+        segments, _info = pipeline.transcribe(
+            pcm, language="en", batch_size=BATCH_SIZE, vad_filter=True
+        )
+        for seg in segments:  # lazy generator – decoded under the lock
+            yield seg.text.strip() + " "
+
+
+def transcribe_audio_stream(model, pcm: Optional[np.ndarray]) -> Iterator[str]:
+    """Yield transcript text as soon as each piece is ready, in playback order.
+
+    *model* None → stub transcript; no decoded audio needed.
+    """
+    if model is None:
+        time.sleep(1)  # simulate latency
+        yield "[Transcript would go here …]"
+        return
+    if FASTER_WHISPER_AVAILABLE:
+        yield from _transcribe_batched(pcm)
+        return
+    # whisper.cpp already spreads each chunk over every core (n_threads), and one
+    # model serves one transcribe at a time – so chunks run in order under the lock
+    for chunk in split_chunks(pcm):
+        yield _transcribe_one(model, chunk) + " "
+
+
+@st.cache_data(show_spinner=False)
 def summarize_text(text: str) -> str:
     time.sleep(1)
     return "[Summary generated from transcript …]"
@@ -114,10 +397,10 @@ def summarize_text(text: str) -> str:
 ###############################################################################
 
 def init_state():
-    st.session_state.setdefault("marks", [])  # List[Dict[str,Any]] – ts, note
+    st.session_state.setdefault("marks", [])  # List[Dict[str,Any]] – id, ts, note; sorted by ts
     st.session_state.setdefault("summary", None)
     st.session_state.setdefault("transcript", None)
-    st.session_state.setdefault("current_time", 0.0)
+    st.session_state.setdefault("current_time", 0)  # whole seconds
 
 init_state()
 
@@ -126,8 +409,8 @@ init_state()
 ###############################################################################
 st.title("🎙️ Podcast Note‑Taker")
 
-audio_bytes: Optional[bytes] = None
 file_id: Optional[str] = None
+audio_path: Optional[Path] = None
 from_url = False
 
 source_tab, upload_tab = st.tabs(["🔗 From URL (best)", "💾 Upload File"])
@@ -140,28 +423,40 @@ with source_tab:
             st.stop()
         event = st_player(url, controls=True, events=["onProgress"], height=80, key="audio_player")
         if event and getattr(event, "name", "") == "onProgress":
-            st.session_state.current_time = event.data.get("playedSeconds", 0)
+            st.session_state.current_time = int(event.data.get("playedSeconds", 0))
         # TODO: Download remote audio for transcription → yt‑dlp / requests
         from_url = True
         file_id = file_md5(url)
 
 with upload_tab:
     uploaded = st.file_uploader("Upload audio file", type=["mp3", "wav"])
+    if uploaded and uploaded.size == 0:
+        st.error("The uploaded file is empty.")
+        st.stop()
     if uploaded:
-        audio_bytes = uploaded.read()
-        st.audio(audio_bytes, format="audio/mp3")
-        file_id = file_md5(audio_bytes)
+        # Hash once per upload; reruns only carry file_id in session state
+        if st.session_state.get("uploaded_fid") != uploaded.file_id:
+            st.session_state.file_id = file_md5(uploaded.getbuffer())  # zero‑copy view
+            st.session_state.uploaded_fid = uploaded.file_id
+        file_id = st.session_state.file_id
+        # A stat per rerun; rewrites the file if AUDIO_DIR pruning removed it
+        audio_path = persist_audio(file_id, uploaded.getbuffer(), Path(uploaded.name).suffix or ".mp3")
+        # Streamlit derives the media URL from a hash of content + mimetype, so any
+        # rerun with the same audio keeps the browser's <audio> element; the
+        # load_audio store only saves re‑reading the file from disk
+        st.audio(load_audio(file_id, audio_path), format="audio/mp3")
         # Fallback timer (st.audio doesn’t expose currentTime)
         st.markdown("**Playback timer (local uploads)** – optional")
         col1, col2 = st.columns(2)
         with col1:
             if st.button("▶️ Start", key="start_timer"):
-                st.session_state.play_start = time.time()
+                st.session_state.play_start_ns = time.monotonic_ns()
         with col2:
             if st.button("⏸️ Stop", key="stop_timer"):
-                st.session_state.pop("play_start", None)
-        if "play_start" in st.session_state:
-            st.session_state.current_time = time.time() - st.session_state.play_start
+                st.session_state.pop("play_start_ns", None)
+        if "play_start_ns" in st.session_state:
+            elapsed_ns = time.monotonic_ns() - st.session_state.play_start_ns
+            st.session_state.current_time = elapsed_ns // 1_000_000_000
 
 # Guard – nothing chosen yet
 if file_id is None:
@@ -175,24 +470,40 @@ col_mark, col_summary = st.columns(2)
 
 with col_mark:
     if st.button("🔖 Mark this moment", use_container_width=True):
-        st.session_state.marks.append({"ts": st.session_state.current_time, "note": ""})
+        marks = st.session_state.marks
+        ts = st.session_state.current_time
+        pos = bisect.bisect_right([m["ts"] for m in marks], ts)
+        marks.insert(pos, {"id": len(marks), "ts": ts, "note": ""})
 
 with col_summary:
-    if st.button("✨ Generate summary", type="primary", use_container_width=True):
-        cached = cache_get(file_id)
-        if cached:
-            transcript, summary = cached
-        else:
-            if from_url:
-                st.error("Server‑side download not implemented yet for URL transcription.")
-                st.stop()
-            with st.spinner("Transcribing …"):
-                transcript = transcribe_audio(audio_bytes)  # type: ignore[arg-type]
-            with st.spinner("Summarizing …"):
-                summary = summarize_text(transcript)
-            cache_save(file_id, transcript, summary)
-        st.session_state.summary = summary
-        st.session_state.transcript = transcript
+    generate = st.button("✨ Generate summary", type="primary", use_container_width=True)
+
+if generate:
+    cached = cache_get(file_id)
+    if cached:
+        transcript, summary = cached
+    else:
+        if from_url:
+            st.error("Server‑side download not implemented yet for URL transcription.")
+            st.stop()
+        model = get_whisper_model()  # None → stub transcription
+        if model is not None and not DECODER_AVAILABLE:
+            st.error("Install `librosa` to decode audio for transcription: `pip install librosa`.")
+            st.stop()
+        # Stream text as it is produced instead of blocking on the whole file
+        with st.status("Decoding audio …", expanded=True) as status:
+            pcm = None
+            if model is not None:
+                pcm = decode_pcm(file_id, audio_path)  # reads the upload only on a .npy miss
+            status.update(label="Transcribing …")
+            transcript = st.write_stream(transcribe_audio_stream(model, pcm)).strip()
+            status.update(label="Summarizing …")
+            summary = summarize_text(transcript)
+            status.update(label="Transcript ready", state="complete", expanded=False)
+        cache_save(file_id, transcript, summary)
+        gc.collect()  # reclaim decode/transcribe garbage now, not mid‑interaction
+    st.session_state.summary = summary
+    st.session_state.transcript = transcript
 
 ###############################################################################
 # ------------------------- UI – NOW PLAYING ---------------------------------
@@ -202,33 +513,48 @@ st.write(f"**Current position:** {hms(st.session_state.current_time)}")
 ###############################################################################
 # ------------------------- UI – KEY MOMENTS ---------------------------------
 ###############################################################################
-if st.session_state.marks:
+# Fragments: editing a note / toggling the transcript reruns only that block
+@st.fragment
+def render_marks(marks: List[Dict]) -> None:
+    if not marks:
+        return
     st.subheader("📌 Key moments (newest first)")
-    for i, mark in enumerate(sorted(st.session_state.marks, key=lambda m: m["ts"], reverse=True)):
+    for mark in reversed(marks):
         col1, col2 = st.columns([1,3])
         col1.write(hms(mark["ts"]))
-        note_key = f"note_{i}_{int(mark['ts'])}"
+        note_key = f"note_{mark['id']}"
         note = col2.text_input("Edit note", value=mark["note"], key=note_key)
         mark["note"] = note  # live update
 
+render_marks(st.session_state.marks)
+
 ###############################################################################
 # ------------------------- UI – SUMMARY / TRANSCRIPT ------------------------
 ###############################################################################
-if st.session_state.summary:
+@st.fragment
+def render_summary(summary: Optional[str], transcript: Optional[str]) -> None:
+    if not summary:
+        return
     st.subheader("📝 Summary")
-    st.write(st.session_state.summary)
+    st.write(summary)
 
     if st.checkbox("Show full transcript"):
         st.subheader("📜 Transcript")
-        st.write(st.session_state.transcript)
+        st.write(transcript)
+
+render_summary(st.session_state.summary, st.session_state.transcript)
 
 ###############################################################################
 # ------------------------- DEBUG -------------------------------------------
 ###############################################################################
-with st.expander("⚙️ Debug info"):
-    st.json({
-        "file_id": file_id,
-        "current_time": st.session_state.current_time,
-        "marks": st.session_state.marks,
-        "summary": bool(st.session_state.summary),
-    })
+@st.fragment
+def render_debug(file_id: str) -> None:
+    with st.expander("⚙️ Debug info"):
+        st.json({
+            "file_id": file_id,
+            "current_time": st.session_state.current_time,
+            "marks": st.session_state.marks,
+            "summary": bool(st.session_state.summary),
+        })
+
+render_debug(file_id)